@@ -1,5 +1,3 @@
-import threading
-
 from snakes.game import Game
 
 
@@ -7,13 +5,7 @@ def start_game(rows: int, cols: int):
     game = Game(row_count=rows, col_count=cols)
 
     game.render_screen()
-    game_loop = threading.Thread(target=game.refresh_game_state)
-    user_input_loop = threading.Thread(target=game.take_input)
-    game_loop.start()
-    user_input_loop.start()
-
-    game_loop.join()
-    user_input_loop.join()
+    game.play()
 
     game.display_score()
 
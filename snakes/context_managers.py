@@ -1,5 +1,3 @@
-import fcntl
-import os
 import sys
 import termios
 from contextlib import contextmanager
@@ -34,17 +32,12 @@ def single_char_input_mode():
     # Update the tty properties. `TCSANOW` flag makes the changes immediately.
     termios.tcsetattr(fd, termios.TCSANOW, newattr)
 
-    # `fcntl` module provides an interface to unix fcntl. This allows to manipulate the file descriptor.
-    # Ref: https://docs.python.org/3/library/fcntl.html
-    # Ref: https://manpages.debian.org/bookworm/manpages-dev/fcntl.2.en.html
-    oldflags = fcntl.fcntl(fd, fcntl.F_GETFL)
-    # Set the standard input to non-blocking mode.
-    # Ref: https://www.geeksforgeeks.org/non-blocking-io-with-pipes-in-c/
-    fcntl.fcntl(fd, fcntl.F_SETFL, oldflags | os.O_NONBLOCK)
+    # The standard input is left in blocking mode. Readers should wait for input with `select` instead
+    # of polling a non-blocking file descriptor in a busy loop.
+    # Ref: https://docs.python.org/3/library/select.html#select.select
     #######################################################
 
     try:
         yield
     finally:
         termios.tcsetattr(fd, termios.TCSAFLUSH, oldterm)
-        fcntl.fcntl(fd, fcntl.F_SETFL, oldflags)
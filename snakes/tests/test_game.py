@@ -1,6 +1,26 @@
-from unittest import TestCase
+from unittest import TestCase, mock
 
-from snakes.game import HEAD, Direction, Game, next_location
+from snakes.game import (
+    BODY,
+    CLEAR_SCREEN,
+    CURSOR_HOME,
+    EMPTY,
+    FOOD,
+    HEAD,
+    Direction,
+    Game,
+    make_next_location,
+    next_location,
+)
+
+
+class DirectionTestCase(TestCase):
+    def test_opposite(self):
+        """Test that every direction has the reverse one as its opposite"""
+        self.assertIs(Direction.RIGHT, Direction.LEFT.opposite)
+        self.assertIs(Direction.LEFT, Direction.RIGHT.opposite)
+        self.assertIs(Direction.DOWN, Direction.UP.opposite)
+        self.assertIs(Direction.UP, Direction.DOWN.opposite)
 
 
 class NextLocationTestCase(TestCase):
@@ -46,13 +66,300 @@ class NextLocationTestCase(TestCase):
         result = next_location(10, 10, 5, 9, Direction.RIGHT)
         self.assertTupleEqual((5, 0), result)
 
+    def test_make_next_location_matches_next_location(self):
+        """Test that the specialized function agrees with next_location on every cell"""
+        for row_count, col_count in ((4, 6), (4, 8), (3, 5)):
+            specialized = make_next_location(row_count, col_count)
+            for x in range(row_count):
+                for y in range(col_count):
+                    for direction in Direction:
+                        self.assertTupleEqual(
+                            next_location(row_count, col_count, x, y, direction),
+                            specialized(x, y, direction),
+                        )
+
 
 class GameTest(TestCase):
     def test_game_initiated_grid_and_head_are_valid(self):
         game = Game(5, 5)
-        self.assertEqual(5, len(game.grid))
-        for row in game.grid:
-            self.assertEqual(5, len(row))
+        self.assertEqual(25, len(game.values))
         self.assertIsNotNone(game.head)
-        self.assertEqual(HEAD, game.head.value)
-        self.assertIsNotNone(game.head.moving)
+        head = game.index(*game.head)
+        self.assertEqual(HEAD, game.values[head])
+        self.assertIn(game.head_direction, Direction)
+
+    def test_move_snake_moves_head_to_next_location(self):
+        game = Game(5, 5)
+        head_x, head_y = game.head
+        next_x, next_y = next_location(5, 5, head_x, head_y, game.head_direction)
+        place_food_away_from(game, (next_x, next_y))
+
+        game.move_snake()
+
+        self.assertEqual(EMPTY, game.values[game.index(head_x, head_y)])
+        self.assertTupleEqual((next_x, next_y), game.head)
+        self.assertEqual(HEAD, game.values[game.index(next_x, next_y)])
+        self.assertEqual(0, game.score)
+
+    def test_move_snake_reuses_the_grid(self):
+        game = Game(5, 5)
+        values = game.values
+        head_x, head_y = game.head
+        place_food_away_from(
+            game, next_location(5, 5, head_x, head_y, game.head_direction)
+        )
+
+        game.move_snake()
+
+        self.assertIs(values, game.values)
+
+    def test_move_snake_grows_when_food_is_eaten(self):
+        game = Game(5, 5)
+        head_x, head_y = game.head
+        next_x, next_y = next_location(5, 5, head_x, head_y, game.head_direction)
+        move_food(game, (next_x, next_y))
+
+        game.move_snake()
+
+        self.assertEqual(BODY, game.values[game.index(head_x, head_y)])
+        self.assertTupleEqual((next_x, next_y), game.head)
+        self.assertEqual(1, game.score)
+        self.assertIn(b"SCORE: 1\n", game.frame())
+        self.assertEqual(FOOD, game.values[game.index(*game.food)])
+
+    def test_game_is_over_when_the_snake_runs_into_itself(self):
+        # Head at (2, 0) moving right, with food placed right ahead of it four times in a row, and then
+        # out of the way.
+        randint_values = [2, 0, 2, 1, 2, 2, 2, 3, 2, 4, 5, 5]
+        with mock.patch("snakes.game.random.randint", side_effect=randint_values):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(6, 6)
+                for _ in range(4):
+                    game.move_snake()
+        self.assertEqual(4, game.score)
+        self.assertTupleEqual((2, 4), game.head)
+
+        # Down, left, then up turns the head back into the body.
+        for key in ("j", "h"):
+            game.handle_key(key)
+            game.move_snake()
+        self.assertTupleEqual((3, 3), game.head)
+        self.assertFalse(game.game_over)
+        values = bytes(game.values)
+
+        game.handle_key("k")
+        game.move_snake()
+
+        self.assertTrue(game.game_over)
+        self.assertTupleEqual((3, 3), game.head)
+        self.assertEqual(values, game.values)
+        self.assertEqual(BODY, game.values[game.index(2, 3)])
+
+    def test_food_is_placed_on_an_empty_cell_when_random_picks_miss(self):
+        with mock.patch("snakes.game.random.randint", side_effect=[0, 0, 0, 1]):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(3, 4)
+
+        # Every random pick lands on the snake.
+        with mock.patch("snakes.game.random.randint", return_value=0):
+            with mock.patch("snakes.game.random.randrange", return_value=0):
+                game.move_snake()
+
+        self.assertEqual(1, game.score)
+        self.assertTupleEqual((0, 2), game.food)
+        self.assertEqual(FOOD, game.values[game.index(0, 2)])
+
+    def test_game_is_over_when_the_snake_fills_the_grid(self):
+        with mock.patch("snakes.game.random.randint", side_effect=[0, 0, 0, 1]):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(1, 2)
+
+        game.move_snake()
+
+        self.assertTrue(game.game_over)
+        self.assertIsNone(game.food)
+
+    def test_handle_key_turns_the_snake_on_the_next_move(self):
+        with mock.patch("snakes.game.random.randint", side_effect=[1, 1, 2, 3]):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(3, 4)
+
+        game.handle_key("j")
+        self.assertIs(Direction.RIGHT, game.head_direction)
+
+        game.move_snake()
+        self.assertIs(Direction.DOWN, game.head_direction)
+        self.assertTupleEqual((2, 1), game.head)
+
+    def test_handle_key_ignores_turns_back_into_the_snake(self):
+        with mock.patch("snakes.game.random.randint", side_effect=[1, 1, 2, 3]):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(3, 4)
+
+        # Up is accepted, but left would reverse the last step to the right.
+        game.handle_key("k")
+        game.handle_key("h")
+        game.move_snake()
+
+        self.assertIs(Direction.UP, game.head_direction)
+        self.assertTupleEqual((0, 1), game.head)
+
+    def test_handle_key_quits_the_game(self):
+        game = Game(3, 4)
+        game.handle_key("q")
+        self.assertTrue(game.quit)
+
+    def test_head_direction_cannot_be_set_directly(self):
+        game = Game(3, 4)
+        with self.assertRaises(NotImplementedError):
+            game.head_direction = Direction.UP
+
+    def test_render_screen_writes_the_whole_frame_at_once(self):
+        with mock.patch("snakes.game.random.randint", side_effect=[0, 0, 2, 3]):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(3, 4)
+        game.move_snake()
+
+        with mock.patch("snakes.game.write_to_terminal") as write_to_terminal:
+            game.render_screen()
+
+        write_to_terminal.assert_called_once_with(
+            CLEAR_SCREEN + b"SCORE: 0\n______\n| #  |\n|    |\n|___@|\n"
+        )
+
+    def test_render_screen_only_redraws_changed_cells(self):
+        with mock.patch("snakes.game.random.randint", side_effect=[0, 0, 2, 3]):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(3, 4)
+
+        with mock.patch("snakes.game.write_to_terminal") as write_to_terminal:
+            game.render_screen()
+            game.move_snake()
+            game.render_screen()
+
+        self.assertEqual(2, write_to_terminal.call_count)
+        write_to_terminal.assert_called_with(
+            # Old head becomes body, then the tail leaves it, then the new head.
+            b"\x1b[3;2H0\x1b[3;2H \x1b[3;3H#"
+            # Cursor is left below the bottom border.
+            b"\x1b[6;1H"
+        )
+
+    def test_render_screen_redraws_the_score_when_it_changes(self):
+        with mock.patch("snakes.game.random.randint", side_effect=[0, 0, 0, 1, 2, 3]):
+            with mock.patch("snakes.game.random.choice", return_value=Direction.RIGHT):
+                game = Game(3, 4)
+                with mock.patch("snakes.game.write_to_terminal") as write_to_terminal:
+                    game.render_screen()
+                    game.move_snake()
+                    game.render_screen()
+
+        self.assertEqual(2, write_to_terminal.call_count)
+        write_to_terminal.assert_called_with(
+            b"\x1b[3;2H0\x1b[3;3H#" + CURSOR_HOME + b"SCORE: 1\n\x1b[5;5H@\x1b[6;1H"
+        )
+
+
+class PlayTest(TestCase):
+    """Test cases for the main loop, with the terminal, the key presses and the clock mocked"""
+
+    def setUp(self):
+        self.game = Game(5, 5)
+        self.now = 0.0
+        self.keys: list[bytes] = []
+        # Called by the mocked `select` with the number of the call, before `keys` are checked.
+        self.on_wait = lambda _: None
+        self.wait_count = 0
+        self.timeouts: list[float] = []
+
+    def wait(self, rlist, wlist, xlist, timeout):
+        self.timeouts.append(timeout)
+        self.on_wait(self.wait_count)
+        self.wait_count += 1
+        return (rlist if self.keys else [], [], [])
+
+    def read(self, fd, n):
+        return self.keys.pop(0)
+
+    def play(self):
+        stdin = mock.Mock()
+        stdin.fileno.return_value = 0
+        with mock.patch("snakes.game.single_char_input_mode"), mock.patch(
+            "snakes.game.sys.stdin", stdin
+        ), mock.patch("snakes.game.select.select", side_effect=self.wait), mock.patch(
+            "snakes.game.os.read", side_effect=self.read
+        ), mock.patch(
+            "snakes.game.time.monotonic", side_effect=lambda: self.now
+        ):
+            self.game.play()
+
+    def test_quit_key_ends_the_loop_without_another_tick(self):
+        self.keys = [b"q"]
+        with mock.patch.object(self.game, "move_snake_and_render_screen") as tick:
+            self.play()
+
+        self.assertTrue(self.game.quit)
+        tick.assert_not_called()
+
+    def test_key_presses_reach_handle_key(self):
+        self.keys = [b"j", b"x", b"q"]
+        with mock.patch.object(
+            self.game, "handle_key", wraps=self.game.handle_key
+        ) as handle_key, mock.patch.object(self.game, "move_snake_and_render_screen"):
+            self.play()
+
+        self.assertListEqual(
+            [mock.call("j"), mock.call("x"), mock.call("q")], handle_key.call_args_list
+        )
+
+    def test_tick_runs_once_the_deadline_passes(self):
+        def on_wait(count):
+            if count == 0:
+                # The whole timeout passes without a key press.
+                self.now = 1.0
+            else:
+                self.game.quit = True
+
+        self.on_wait = on_wait
+        with mock.patch.object(self.game, "move_snake_and_render_screen") as tick:
+            self.play()
+
+        tick.assert_called_once_with()
+        # Slept until the first deadline, then until the next one.
+        self.assertListEqual([1.0, 1.0], self.timeouts)
+
+    def test_missed_ticks_are_skipped_and_the_screen_is_redrawn(self):
+        def on_wait(count):
+            if count == 0:
+                # The clock jumps several ticks ahead, e.g. while the game is suspended.
+                self.now = 5.5
+            else:
+                self.game.quit = True
+
+        self.on_wait = on_wait
+        with mock.patch("snakes.game.write_to_terminal"):
+            self.game.render_screen()
+        with mock.patch.object(self.game, "move_snake_and_render_screen") as tick:
+            self.play()
+
+        tick.assert_called_once_with()
+        # The next tick is a whole tick after the clock jump.
+        self.assertListEqual([1.0, 1.0], self.timeouts)
+        self.assertTrue(self.game.frame().startswith(CLEAR_SCREEN))
+
+
+def move_food(game: Game, location: tuple[int, int]):
+    game.values[game.index(*game.food)] = EMPTY
+    game.values[game.index(*location)] = FOOD
+    game.food = location
+
+
+def place_food_away_from(game: Game, location: tuple[int, int]):
+    """Move the food out of the given location so that the snake does not eat it"""
+    if game.food != location:
+        return
+    for x in range(game.row_count):
+        for y in range(game.col_count):
+            if game.values[game.index(x, y)] == EMPTY and (x, y) != location:
+                move_food(game, (x, y))
+                return